@@ -1,2 +1,2 @@
 from ._api import API, APIError, LoginError, __version__
-
+from ._transport import RecordingSession, ReplaySession
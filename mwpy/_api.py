@@ -81,7 +81,7 @@ class API:
     ) -> dict:
         retry_after = resp.headers['retry-after']
         warning(f'maxlag error (retrying after {retry_after} seconds)')
-        await sleep(int(retry_after))
+        await sleep(float(retry_after))
         return await(self.post(**data))
 
     def _handle_badtoken_error(self, _: Response, __: dict, error: dict):
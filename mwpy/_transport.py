@@ -0,0 +1,144 @@
+from collections import defaultdict, deque
+from gzip import open as gzip_open
+from json import dumps, loads
+from logging import debug, warning
+from typing import Any
+
+from trio import current_time, sleep
+
+# only these response headers are read by the client; others, most notably
+# set-cookie, may contain credentials and are never written to an archive
+RECORDED_HEADERS = ('retry-after', 'content-type')
+# values of these parameters are never written to an archive, in addition to
+# any parameter whose name ends with `token` or `password`
+REDACTED_PARAMS = frozenset({'retype'})
+
+
+def _is_secret(param: str) -> bool:
+    return param.endswith(('token', 'password')) or param in REDACTED_PARAMS
+
+
+def normalize_params(data: dict) -> dict:
+    """Return a canonical copy of the given post data.
+
+    Values are converted to str (the way they are sent over the wire), keys
+    are sorted, and sensitive values are redacted.
+    """
+    return {
+        k: '' if _is_secret(k) else str(v)
+        for k, v in sorted(data.items())}
+
+
+def _params_key(params: dict) -> tuple:
+    return tuple(sorted(params.items()))
+
+
+def _redact_json(json: dict) -> dict:
+    """Return json with the values of `query.tokens` redacted."""
+    tokens = json.get('query', {}).get('tokens')
+    if not tokens:
+        return json
+    return {**json, 'query': {
+        **json['query'], 'tokens': dict.fromkeys(tokens, '')}}
+
+
+class ReplayResponse:
+
+    __slots__ = 'headers', '_json'
+
+    def __init__(self, headers: dict, json: dict) -> None:
+        self.headers = headers
+        self._json = json
+
+    def json(self) -> dict:
+        return self._json
+
+
+class RecordingSession:
+
+    def __init__(self, session, path: str) -> None:
+        """Wrap an asks session and record its posts into a gzip archive.
+
+        Usage: `api.session = RecordingSession(api.session, 'rec.jsonl.gz')`
+
+        Each post is stored as a single JSON line containing the normalized
+        parameters, the response headers and json, and the elapsed time.
+        Passwords, tokens, and cookies are not stored. Records are flushed
+        as they are written, so an archive that was never closed (e.g. due
+        to a crash) can still be replayed up to its last complete record.
+
+        :param session: the session to be wrapped, usually `API.session`
+        :param path: path of the archive file to be created
+        """
+        self.session = session
+        self._file = gzip_open(path, 'wt', encoding='utf8')
+
+    async def post(self, url: str, data: dict, **kwargs: Any):
+        start = current_time()
+        resp = await self.session.post(url, data=data, **kwargs)
+        elapsed = current_time() - start
+        headers = {k.lower(): v for k, v in resp.headers.items()}
+        file = self._file
+        file.write(dumps({
+            'params': normalize_params(data),
+            'headers': {
+                k: headers[k] for k in RECORDED_HEADERS if k in headers},
+            'json': _redact_json(resp.json()),
+            'elapsed': elapsed,
+        }, ensure_ascii=False) + '\n')
+        file.flush()
+        return resp
+
+    async def close(self) -> None:
+        self._file.close()
+        await self.session.close()
+
+
+class ReplaySession:
+
+    def __init__(self, path: str, speed: float = None) -> None:
+        """Serve responses from an archive created by RecordingSession.
+
+        Usage: `api.session = ReplaySession('rec.jsonl.gz', speed=1)`
+
+        Posts are matched on their normalized parameters. Identical requests
+        are answered in the order they were recorded.
+
+        :param path: path of the archive file
+        :param speed: if None, respond immediately; otherwise wait for the
+            recorded elapsed time divided by `speed`, e.g. speed=1 replays at
+            the recorded timing and speed=2 replays twice as fast.
+            The retry-after header of replayed responses, which is used for
+            waiting on maxlag errors, is scaled the same way (and is set to
+            0 if speed is None).
+        """
+        self.speed = speed
+        records = self._records = defaultdict(deque)
+        with gzip_open(path, 'rt', encoding='utf8') as f:
+            try:
+                for line in f:
+                    record = loads(line)
+                    records[_params_key(record['params'])].append(record)
+            except EOFError:
+                warning(f'{path} was not closed properly; '
+                        f'only its complete records will be replayed')
+
+    async def post(self, _: str, data: dict, **__: Any) -> ReplayResponse:
+        params = normalize_params(data)
+        queue = self._records.get(_params_key(params))
+        if not queue:
+            raise LookupError(f'no recorded response for {params}')
+        record = queue.popleft()
+        debug('replaying response for %s', params)
+        speed = self.speed
+        if speed is not None:
+            await sleep(record['elapsed'] / speed)
+        headers = record['headers']
+        retry_after = headers.get('retry-after')
+        if retry_after is not None:
+            headers['retry-after'] = '0' if speed is None else str(
+                float(retry_after) / speed)
+        return ReplayResponse(headers, record['json'])
+
+    async def close(self) -> None:
+        pass
@@ -1,10 +1,12 @@
 from dataclasses import dataclass
+from gzip import open as gzip_open
 from pprint import pformat
 from unittest.mock import patch
 
 from pytest import mark
 
-from mwpy import API, LoginError, APIError
+from mwpy import API, LoginError, APIError, RecordingSession, \
+    ReplaySession
 
 
 api = API('https://www.mediawiki.org/w/api.php')
@@ -268,3 +270,98 @@ async def test_revisions_mode2_no_rvlimit(post_mock):  # auto set rvlimit
         {'ns': 0, 'pageid': 112963, 'revisions': [{'comment': '', 'minor': False, 'parentid': 438023, 'revid': 438026, 'timestamp': '2020-06-25T21:09:52Z', 'user': 'DMaza (WMF)'}, {'comment': '', 'minor': False, 'parentid': 438022, 'revid': 438023, 'timestamp': '2020-06-25T21:08:12Z', 'user': 'DMaza (WMF)'}, {'comment': '1', 'minor': False, 'parentid': 0, 'revid': 438022, 'timestamp': '2020-06-25T21:08:02Z', 'user': 'DMaza (WMF)'}], 'title': 'DmazaTest'}
     ] == [r async for r in api.revisions(titles='DmazaTest', rvstart='now')]
     assert post_mock.mock_calls[0].kwargs == {'action': 'query', 'prop': 'revisions', 'titles': 'DmazaTest', 'rvstart': 'now', 'rvlimit': 'max'}
+
+
+class FakeSession:
+
+    def __init__(self, *responses: FakeResp):
+        self.responses = iter(responses)
+
+    async def post(self, *_, **__):
+        return next(self.responses)
+
+    async def close(self):
+        pass
+
+
+def read_archive(path: str) -> str:
+    with gzip_open(path, 'rt', encoding='utf8') as f:
+        return f.read()
+
+
+@patch('mwpy._transport.sleep')
+@patch('mwpy._transport.current_time', side_effect=[0, 2, 10, 13])
+async def test_record_and_replay(_, sleep_mock, tmp_path):
+    path = str(tmp_path / 'rec.jsonl.gz')
+    a = API('https://www.mediawiki.org/w/api.php')
+    a.session = RecordingSession(FakeSession(
+        FakeResp({}, {'batchcomplete': True, 'continue': {'rccontinue': '1', 'continue': '-||'}, 'query': {'recentchanges': [{'type': 'log'}]}}),
+        FakeResp({}, {'batchcomplete': True, 'query': {'recentchanges': [{'type': 'edit'}]}})), path)
+    recorded = [rc async for rc in a.recentchanges(rclimit=1)]
+    await a.close()
+    assert recorded == [{'type': 'log'}, {'type': 'edit'}]
+
+    a.session = ReplaySession(path, speed=2)
+    assert [rc async for rc in a.recentchanges(rclimit=1)] == recorded
+    assert [c.args for c in sleep_mock.await_args_list] == [(1,), (1.5,)]
+    try:
+        await a.post(action='query')
+    except LookupError:
+        pass
+    else:  # pragma: nocover
+        raise AssertionError('LookupError was not raised')
+
+
+async def test_record_login_redacts_secrets(tmp_path):
+    path = str(tmp_path / 'rec.jsonl.gz')
+    a = API('https://www.mediawiki.org/w/api.php')
+    a.session = RecordingSession(FakeSession(
+        FakeResp({'Set-Cookie': ['wikiSession=SECRETSESSION; path=/']}, {'batchcomplete': True, 'query': {'tokens': {'logintoken': 'SECRETLT'}}}),
+        FakeResp({'Content-Type': 'application/json', 'Set-Cookie': ['centralauth_Token=SECRETCA']}, {'login': {'result': 'Success', 'lguserid': 1, 'lgusername': 'U'}})), path)
+    await a.login(lgname='U', lgpassword='SECRETPW')
+    await a.close()
+    archive = read_archive(path)
+    assert 'SECRET' not in archive
+    assert 'set-cookie' not in archive
+    assert 'application/json' in archive
+
+    a.session = ReplaySession(path)
+    await a.login(lgname='U', lgpassword='another password')
+
+
+@patch('mwpy._api.sleep')
+@patch('mwpy._api.warning')
+async def test_replay_maxlag(_, sleep_mock, tmp_path):
+    path = str(tmp_path / 'rec.jsonl.gz')
+    a = API('https://www.mediawiki.org/w/api.php')
+    a.session = RecordingSession(FakeSession(
+        FakeResp({'retry-after': '5'}, {'errors': [{'code': 'maxlag', 'text': 'Waiting', 'module': 'main'}]}),
+        FakeResp({}, {'batchcomplete': True, 'query': {'tokens': {'watchtoken': '+\\'}}})), path)
+    await a.tokens('watch')
+    await a.close()
+    sleep_mock.assert_awaited_once_with(5)
+
+    sleep_mock.reset_mock()
+    a.session = ReplaySession(path)
+    assert await a.tokens('watch') == {'watchtoken': ''}
+    sleep_mock.assert_awaited_once_with(0)
+
+    sleep_mock.reset_mock()
+    with patch('mwpy._transport.sleep'):
+        a.session = ReplaySession(path, speed=2)
+        await a.tokens('watch')
+    sleep_mock.assert_awaited_once_with(2.5)
+
+
+@patch('mwpy._transport.warning')
+async def test_replay_unclosed_archive(warning_mock, tmp_path):
+    path = str(tmp_path / 'rec.jsonl.gz')
+    a = API('https://www.mediawiki.org/w/api.php')
+    recording_session = a.session = RecordingSession(FakeSession(
+        FakeResp({}, {'batchcomplete': True, 'query': {'userinfo': {'id': 0}}})), path)
+    await a.userinfo()
+    # simulate a crash; the archive is not closed
+    a.session = ReplaySession(path)
+    recording_session._file.close()
+    warning_mock.assert_called_once()
+    assert await a.userinfo() == {'id': 0}